@@ -1,4 +1,4 @@
-import json
+import orjson
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
@@ -43,7 +43,7 @@ class BaseConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data):
         """Handle incoming WebSocket message."""
         try:
-            data = json.loads(text_data)
+            data = orjson.loads(text_data)
             message_type = data.get('type', 'message')
             
             # Route to handler method
@@ -52,7 +52,7 @@ class BaseConsumer(AsyncWebsocketConsumer):
                 await handler(data)
             else:
                 await self.send_error(f'Unknown message type: {message_type}')
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             await self.send_error('Invalid JSON')
         except Exception as e:
             await self.send_error(str(e))
@@ -71,7 +71,9 @@ class BaseConsumer(AsyncWebsocketConsumer):
     
     async def send_json(self, data):
         """Send JSON data to the WebSocket."""
-        await self.send(text_data=json.dumps(data))
+        await self.send(
+            text_data=orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+        )
     
     async def send_error(self, message):
         """Send error message to the WebSocket."""
@@ -1,8 +1,18 @@
-from datetime import datetime
+import asyncio
+from time import time_ns
 from channels.db import database_sync_to_async
+from django.db.models import Q
+from ..db import db_sync_to_async
+from ..models import ChatMessage, Session
+from ..session_cache import cache_participant, is_cached_participant
 from .base import BaseConsumer
 
 
+# (session_id, user_id) -> (task, channel_name) for user_left broadcasts
+# still inside their grace period; a reconnect in time cancels them
+_pending_leaves = {}
+
+
 class ChatConsumer(BaseConsumer):
     """
     WebSocket consumer for chat messaging within a session.
@@ -15,6 +25,12 @@ class ChatConsumer(BaseConsumer):
     URL: ws/chat/{session_id}/
     """
     
+    # Minimum gap between forwarded "started typing" events per connection
+    TYPING_THROTTLE_SECONDS = 2.0
+    
+    # How long a disconnect waits for a reconnect before announcing user_left
+    LEAVE_GRACE_SECONDS = 0.1
+    
     async def get_groups(self):
         self.session_id = self.scope['url_route']['kwargs']['session_id']
         self.chat_group = f'chat_{self.session_id}'
@@ -29,7 +45,23 @@ class ChatConsumer(BaseConsumer):
     
     async def on_connected(self):
         """Notify other participant that user joined chat and send history."""
-        user_data = await self.get_user_data(self.user)
+        # A quick reconnect swallows the pending user_left; peers only need
+        # to swap the old channel for the new one. Done before any await so
+        # the grace period cannot run out while history is loading.
+        replaces = None
+        pending = _pending_leaves.pop((self.session_id, self.user.id), None)
+        if pending:
+            task, replaces = pending
+            task.cancel()
+        
+        self._last_typing_sent = float('-inf')
+        self._last_typing_state = None
+        # Channel name -> user ID for the other participant's open chat
+        # connections, used to deliver typing events without a group fan-out
+        self._peer_channels = {}
+        
+        # self.user is fixed for the connection, so serialize it once
+        self._user_data = await self.get_user_data(self.user)
         
         # Send recent chat history to the user
         await self.send_chat_history()
@@ -37,20 +69,23 @@ class ChatConsumer(BaseConsumer):
         await self.broadcast_to_group(
             self.chat_group,
             'user_joined',
-            {'user': user_data}
+            {
+                'user': self._user_data,
+                'channel': self.channel_name,
+                'replaces': replaces
+            }
         )
     
     @database_sync_to_async
     def get_chat_history(self):
         """Fetch recent chat messages for this session."""
-        from ..models import ChatMessage
         # Get LAST 50 messages (newest), then reverse to show in chronological order
         messages = ChatMessage.objects.filter(session_id=self.session_id).order_by('-timestamp')[:50]
         history = [
             {
                 'sender': msg.sender.name,
                 'message': msg.message,
-                'timestamp': msg.timestamp.isoformat()
+                'timestamp': int(msg.timestamp.timestamp() * 1000)
             }
             for msg in messages
         ]
@@ -68,16 +103,30 @@ class ChatConsumer(BaseConsumer):
             })
 
     async def on_disconnected(self):
-        """Notify other participant that user left chat."""
-        if not hasattr(self, 'chat_group'):
+        """
+        Notify other participant that user left chat.
+        Deferred by LEAVE_GRACE_SECONDS so a reconnect can cancel it.
+        """
+        if not hasattr(self, 'chat_group') or not hasattr(self, '_user_data'):
             return
-
-        user_data = await self.get_user_data(self.user)
+        
+        key = (self.session_id, self.user.id)
+        _pending_leaves[key] = (
+            asyncio.create_task(self._emit_left(key)),
+            self.channel_name
+        )
+    
+    async def _emit_left(self, key):
+        """Broadcast user_left once the grace period passes without a reconnect."""
+        await asyncio.sleep(self.LEAVE_GRACE_SECONDS)
+        # A later disconnect of the same user may have taken over the slot
+        if _pending_leaves.get(key, (None,))[0] is asyncio.current_task():
+            del _pending_leaves[key]
         
         await self.broadcast_to_group(
             self.chat_group,
             'user_left',
-            {'user': user_data}
+            {'user': self._user_data, 'channel': self.channel_name}
         )
     
     async def handle_chat_message(self, data):
@@ -88,8 +137,6 @@ class ChatConsumer(BaseConsumer):
         if not message:
             return
         
-        user_data = await self.get_user_data(self.user)
-        
         # Save message to DB
         await self.save_message(self.user, message)
         
@@ -98,16 +145,15 @@ class ChatConsumer(BaseConsumer):
             self.chat_group,
             'chat_message',
             {
-                'sender': user_data['name'], # Frontend expects sender name string
+                'sender': self._user_data['name'], # Frontend expects sender name string
                 'message': message,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': time_ns() // 1_000_000  # epoch milliseconds
             }
         )
 
     @database_sync_to_async
     def save_message(self, user, message):
         """Save chat message to database."""
-        from ..models import ChatMessage
         ChatMessage.objects.create(
             session_id=self.session_id,
             sender=user,
@@ -115,22 +161,45 @@ class ChatConsumer(BaseConsumer):
         )
     
     async def handle_typing(self, data):
-        """Handle typing indicator."""
-        is_typing = data.get('is_typing', False)
-        user_data = await self.get_user_data(self.user)
+        """
+        Handle typing indicator.
+        At most one start event is forwarded per TYPING_THROTTLE_SECONDS,
+        whatever came before it, and duplicate stop events are dropped, so
+        a buggy client cannot flood the peer.
+        """
+        is_typing = bool(data.get('is_typing', False))
+        now = asyncio.get_running_loop().time()
         
-        await self.broadcast_to_group(
-            self.chat_group,
-            'typing_indicator',
-            {
-                'user': user_data,
+        if is_typing:
+            if now - self._last_typing_sent < self.TYPING_THROTTLE_SECONDS:
+                return
+            self._last_typing_sent = now
+        elif not self._last_typing_state:
+            return
+        self._last_typing_state = is_typing
+        
+        # Send straight to the peer's connections; the sender never needs it
+        for channel in self._peer_channels:
+            await self.channel_layer.send(channel, {
+                'type': 'typing_indicator',
+                'user': self._user_data,
                 'is_typing': is_typing
-            }
-        )
+            })
     
     # Group message handlers
     async def user_joined(self, event):
         """Handle user joined broadcast."""
+        self._peer_channels.pop(event.get('replaces'), None)
+        
+        if event['user']['id'] != self.user.id:
+            self._peer_channels[event['channel']] = event['user']['id']
+            # Tell the newcomer where to reach this connection
+            await self.channel_layer.send(event['channel'], {
+                'type': 'peer_channel',
+                'user_id': self.user.id,
+                'channel': self.channel_name
+            })
+        
         await self.send_json({
             'type': 'user_joined',
             'user': event['user']
@@ -138,6 +207,13 @@ class ChatConsumer(BaseConsumer):
     
     async def user_left(self, event):
         """Handle user left broadcast."""
+        self._peer_channels.pop(event.get('channel'), None)
+        
+        # The user may already be back on another connection (e.g. one
+        # served by a different worker); don't report them as gone
+        if event['user']['id'] in self._peer_channels.values():
+            return
+        
         await self.send_json({
             'type': 'user_left',
             'user': event['user']
@@ -152,23 +228,41 @@ class ChatConsumer(BaseConsumer):
             'timestamp': event['timestamp']
         })
     
+    async def peer_channel(self, event):
+        """Record a peer connection announced in reply to user_joined."""
+        if event['user_id'] != self.user.id:
+            self._peer_channels[event['channel']] = event['user_id']
+    
     async def typing_indicator(self, event):
-        """Handle typing indicator broadcast."""
-        # Don't send typing indicator to the user who is typing
-        if event['user']['id'] != self.user.id:
-            await self.send_json({
-                'type': 'typing',
-                'user': event['user'],
-                'is_typing': event['is_typing']
-            })
+        """Handle typing indicator sent directly by the peer."""
+        await self.send_json({
+            'type': 'typing',
+            'user': event['user'],
+            'is_typing': event['is_typing']
+        })
     
-    @database_sync_to_async
-    def verify_session_participant(self):
-        """Verify user is a participant in the session."""
-        from ..models import Session
-        
-        try:
-            session = Session.objects.get(pk=self.session_id)
-            return self.user in [session.user1, session.user2]
-        except Session.DoesNotExist:
-            return False
+    async def verify_session_participant(self):
+        """
+        Verify user is a participant in the session.
+        Checks the user's cached active sessions first, then the DB.
+        """
+        if await is_cached_participant(self.user.id, self.session_id):
+            return True
+        
+        is_active = await self.query_session_participant()
+        # Only active sessions belong in the cached set
+        if is_active:
+            await cache_participant(self.user.id, self.session_id)
+        return is_active is not None
+    
+    @db_sync_to_async
+    def query_session_participant(self):
+        """
+        Check session participation in the DB.
+        Returns the session's is_active flag, or None if the user is not
+        a participant (or the session does not exist).
+        """
+        return Session.objects.filter(
+            Q(user1_id=self.user.id) | Q(user2_id=self.user.id),
+            pk=self.session_id
+        ).values_list('is_active', flat=True).first()
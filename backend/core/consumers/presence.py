@@ -1,7 +1,12 @@
+import logging
+
 from channels.db import database_sync_to_async
 from .base import BaseConsumer
 
 
+logger = logging.getLogger(__name__)
+
+
 class PresenceConsumer(BaseConsumer):
     """
     WebSocket consumer for online/offline presence.
@@ -22,10 +27,11 @@ class PresenceConsumer(BaseConsumer):
         """Mark user as online and broadcast."""
         try:
             if not self.user.is_authenticated:
-                print("DEBUG: PresenceConsumer - Anonymous user connected, ignoring")
+                logger.debug("PresenceConsumer - anonymous user connected, ignoring")
                 return
 
-            print(f"DEBUG: PresenceConsumer.on_connected for user {self.user.id}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("PresenceConsumer.on_connected for user %s", self.user.id)
             
             # Simple online status update (no counting)
             await self.set_user_online(True)
@@ -49,9 +55,7 @@ class PresenceConsumer(BaseConsumer):
                 'users': online_users
             })
         except Exception as e:
-            import traceback
-            print(f"ERROR: PresenceConsumer.on_connected failed: {e}")
-            traceback.print_exc()
+            logger.exception("PresenceConsumer.on_connected failed: %s", e)
             await self.close(code=4002)
     
     async def on_disconnected(self):
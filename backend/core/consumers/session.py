@@ -1,5 +1,6 @@
 from datetime import datetime
 from channels.db import database_sync_to_async
+from ..db import db_sync_to_async
 from .base import BaseConsumer
 
 
@@ -214,7 +215,7 @@ class SessionConsumer(BaseConsumer):
             'new_balance': event['new_balance']
         })
     
-    @database_sync_to_async
+    @db_sync_to_async
     def verify_session_participant(self):
         """Verify user is a participant in the session."""
         from ..models import Session
@@ -234,6 +235,8 @@ class SessionConsumer(BaseConsumer):
         session = Session.objects.get(pk=self.session_id)
         return SessionSerializer(session).data
     
+    # Stays on database_sync_to_async: the shared thread-sensitive thread
+    # serializes this check-then-act with SessionViewSet's timer actions
     @database_sync_to_async
     def start_timer(self):
         """Start teaching timer for current user."""
@@ -260,6 +263,7 @@ class SessionConsumer(BaseConsumer):
             'start_time': timer.start_time.isoformat()
         }
     
+    # Same threading constraint as start_timer
     @database_sync_to_async
     def stop_timer(self):
         """Stop current user's teaching timer."""
@@ -305,72 +309,37 @@ class SessionConsumer(BaseConsumer):
     def end_session(self):
         """End session and process credits."""
         from django.db import transaction
-        from decimal import Decimal
-        from ..models import Session, CreditTransaction, Bank
-        from ..utils import calculate_credits
-        
-        session = Session.objects.get(pk=self.session_id)
-        
-        if not session.is_active:
-            return {'success': False, 'error': 'Session is already ended'}
-        
-        # End session
-        session.end_session()
-        
-        # Calculate credit transfers
-        user1_teaching = session.get_teaching_time(session.user1)
-        user2_teaching = session.get_teaching_time(session.user2)
-        
-        credit_summary = {
-            'user1': {'earned': 0, 'spent': 0},
-            'user2': {'earned': 0, 'spent': 0},
-            'bank_cut': 0
-        }
-        
-        bank = Bank.get_instance()
+        from ..credits import process_credit_transfers
+        from ..models import Session
         
         with transaction.atomic():
-            # User1 taught -> User2 pays
-            if user1_teaching > 0:
-                credits = calculate_credits(user1_teaching)
-                bank_cut = credits * Decimal('0.10')
-                teacher_gets = credits - bank_cut
-                
-                CreditTransaction.record_transaction(
-                    session.user2, -credits, 'LEARNING', session,
-                    f'Learning from {session.user1.name}'
-                )
-                CreditTransaction.record_transaction(
-                    session.user1, teacher_gets, 'TEACHING', session,
-                    f'Teaching {session.user2.name}'
-                )
-                bank.add_credits(bank_cut)
-                
-                credit_summary['user1']['earned'] = float(teacher_gets)
-                credit_summary['user2']['spent'] = float(credits)
-                credit_summary['bank_cut'] += float(bank_cut)
+            # Lock the session row so concurrent end requests (here or via the
+            # REST endpoint) cannot both pass the is_active check
+            session = Session.objects.select_for_update(of=('self',)).select_related(
+                'user1', 'user2'
+            ).get(pk=self.session_id)
             
-            # User2 taught -> User1 pays
-            if user2_teaching > 0:
-                credits = calculate_credits(user2_teaching)
-                bank_cut = credits * Decimal('0.10')
-                teacher_gets = credits - bank_cut
-                
-                CreditTransaction.record_transaction(
-                    session.user1, -credits, 'LEARNING', session,
-                    f'Learning from {session.user2.name}'
-                )
-                CreditTransaction.record_transaction(
-                    session.user2, teacher_gets, 'TEACHING', session,
-                    f'Teaching {session.user1.name}'
-                )
-                bank.add_credits(bank_cut)
-                
-                credit_summary['user2']['earned'] = float(teacher_gets)
-                credit_summary['user1']['spent'] = float(credits)
-                credit_summary['bank_cut'] += float(bank_cut)
-        
-        return {'success': True, 'credit_summary': credit_summary}
+            if not session.is_active:
+                return {'success': False, 'error': 'Session is already ended'}
+            
+            # End session
+            session.end_session()
+            
+            # Same transfer rules (balance cap, bank rounding) as the REST end
+            summary = process_credit_transfers(session)
+            credit_summary = {
+                'user1': {
+                    'earned': summary['user1']['credits_earned'],
+                    'spent': summary['user1']['credits_spent'],
+                },
+                'user2': {
+                    'earned': summary['user2']['credits_earned'],
+                    'spent': summary['user2']['credits_spent'],
+                },
+                'bank_cut': summary['bank_cut']
+            }
+            
+            return {'success': True, 'credit_summary': credit_summary}
     
     @database_sync_to_async
     def get_user_credits(self):
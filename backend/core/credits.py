@@ -0,0 +1,157 @@
+"""
+Credit transfers for ending a session.
+
+Shared by the REST end action and SessionConsumer so both charge learners
+and pay the bank with the same rounding and balance caps.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Bank, CreditTransaction, User
+from .utils import calculate_credits, from_cents, to_cents
+
+
+def process_credit_transfers(session):
+    """
+    Process credit transfers based on teaching time.
+    5 minutes teaching = 1 credit
+    Bank takes 10% cut from teacher earnings.
+
+    Balances are computed in memory, then written with one bulk INSERT
+    for the transactions and one F() UPDATE per user and for the bank.
+    """
+    teaching_times = session.get_teaching_times()
+    user1_teaching_seconds = teaching_times.get(session.user1_id, 0)
+    user2_teaching_seconds = teaching_times.get(session.user2_id, 0)
+
+    credit_summary = {
+        'user1': {
+            'id': session.user1.id,
+            'name': session.user1.name,
+            'teaching_seconds': user1_teaching_seconds,
+            'credits_earned': 0,
+            'credits_spent': 0,
+        },
+        'user2': {
+            'id': session.user2.id,
+            'name': session.user2.name,
+            'teaching_seconds': user2_teaching_seconds,
+            'credits_earned': 0,
+            'credits_spent': 0,
+        },
+        'bank_cut': 0
+    }
+
+    bank = Bank.get_instance()
+
+    with transaction.atomic():
+        # Lock both users' rows (in pk order to avoid deadlocks) and read
+        # the latest credits from them, so a concurrent transfer cannot
+        # spend the same balance
+        balances = dict(
+            User.objects.select_for_update()
+            .filter(pk__in=[session.user1_id, session.user2_id])
+            .order_by('pk')
+            .values_list('pk', 'credits')
+        )
+        session.user1.credits = balances[session.user1_id]
+        session.user2.credits = balances[session.user2_id]
+
+        # Transfer math runs on integer cents; Decimals only at the edges
+        balances = {pk: to_cents(credits) for pk, credits in balances.items()}
+        txs = []
+        transfer_args = {'session': session, 'balances': balances, 'txs': txs}
+
+        # User1 taught, User2 learns
+        total_bank_cut_cents = _transfer(
+            teacher=session.user1,
+            learner=session.user2,
+            teacher_seconds=user1_teaching_seconds,
+            summary_teacher=credit_summary['user1'],
+            summary_learner=credit_summary['user2'],
+            **transfer_args
+        )
+        # User2 taught, User1 learns
+        total_bank_cut_cents += _transfer(
+            teacher=session.user2,
+            learner=session.user1,
+            teacher_seconds=user2_teaching_seconds,
+            summary_teacher=credit_summary['user2'],
+            summary_learner=credit_summary['user1'],
+            **transfer_args
+        )
+        total_bank_cut = from_cents(total_bank_cut_cents)
+        credit_summary['bank_cut'] = float(total_bank_cut)
+
+        if txs:
+            CreditTransaction.objects.bulk_create(txs)
+
+            for user in (session.user1, session.user2):
+                balance = from_cents(balances[user.pk])
+                delta = balance - user.credits
+                if delta:
+                    User.objects.filter(pk=user.pk).update(
+                        credits=F('credits') + delta
+                    )
+                    user.credits = balance
+
+            if total_bank_cut:
+                Bank.objects.filter(pk=bank.pk).update(
+                    total_credits=F('total_credits') + total_bank_cut,
+                    updated_at=timezone.now()
+                )
+
+    return credit_summary
+
+
+def _transfer(*, session, teacher, learner, teacher_seconds,
+              summary_teacher, summary_learner, balances, txs):
+    """
+    Queue a learner -> teacher transfer for teacher_seconds of teaching,
+    capped at the learner's balance.
+    balances holds integer cents. Updates balances, txs and the summary
+    dicts in place and returns the bank's cut in cents.
+    """
+    if teacher_seconds <= 0:
+        return 0
+
+    credits_needed = to_cents(calculate_credits(teacher_seconds))
+
+    # Check learner balance
+    actual_cents = min(credits_needed, balances[learner.pk])
+    if actual_cents <= 0:
+        return 0
+
+    # Bank's 10% is rounded down to the cent; the teacher gets the rest
+    bank_cut_cents = actual_cents // 10
+    teacher_cents = actual_cents - bank_cut_cents
+    actual_credits = from_cents(actual_cents)
+    teacher_receives = from_cents(teacher_cents)
+
+    # Deduct from learner
+    balances[learner.pk] -= actual_cents
+    txs.append(CreditTransaction(
+        user=learner,
+        amount=-actual_credits,
+        transaction_type='LEARNING',
+        session=session,
+        balance_after=from_cents(balances[learner.pk]),
+        description=f'Learning from {teacher.name}'
+    ))
+    summary_learner['credits_spent'] = float(actual_credits)
+
+    # Add to teacher - minus bank cut
+    balances[teacher.pk] += teacher_cents
+    txs.append(CreditTransaction(
+        user=teacher,
+        amount=teacher_receives,
+        transaction_type='TEACHING',
+        session=session,
+        balance_after=from_cents(balances[teacher.pk]),
+        description=f'Teaching {learner.name}'
+    ))
+    summary_teacher['credits_earned'] = float(teacher_receives)
+
+    return bank_cut_cents
@@ -0,0 +1,47 @@
+"""
+Dedicated thread pool for ORM calls made from async code.
+
+channels' database_sync_to_async runs on asgiref's shared thread, which
+serializes every DB call and gives CONN_MAX_AGE no stable thread to keep a
+connection on. Hot WebSocket paths use this pool instead: each worker
+thread holds its own persistent connection, recycled via
+close_old_connections() around every call just like database_sync_to_async.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('DB_EXECUTOR_WORKERS', 8)),
+    thread_name_prefix='db'
+)
+
+
+def _call_with_connection_cleanup(fn, *args, **kwargs):
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a sync DB-bound callable on DB_EXECUTOR and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        DB_EXECUTOR,
+        functools.partial(_call_with_connection_cleanup, fn, *args, **kwargs)
+    )
+
+
+def db_sync_to_async(fn):
+    """Decorator form of run_db, a drop-in for @database_sync_to_async."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_db(fn, *args, **kwargs)
+    return wrapper
@@ -1,22 +1,75 @@
-from channels.db import database_sync_to_async
+import copy
+import hashlib
+import logging
+import time
+from urllib.parse import parse_qs
+
+from cachetools import TTLCache
 from channels.middleware import BaseMiddleware
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
+from .db import db_sync_to_async
+
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PROTOCOL_PREFIX = 'access_token_'
+_TOKEN_PROTOCOL_PREFIX_LEN = len(_TOKEN_PROTOCOL_PREFIX)
+
+# Validated tokens -> (user, exp). Keyed by a SHA-256 digest so raw tokens
+# are never held in memory. Only touched from the event loop thread. The
+# cached User is never handed out itself: each connection gets its own copy,
+# since consumers mutate scope['user'] (e.g. is_online).
+_token_cache = TTLCache(maxsize=10_000, ttl=60)
+
+
+def _token_cache_key(token_key):
+    return hashlib.sha256(token_key.encode()).hexdigest()
+
 
-@database_sync_to_async
+def get_cached_user(token_key):
+    """Return the cached user for a token, or None on a miss or expiry."""
+    cache_key = _token_cache_key(token_key)
+    entry = _token_cache.get(cache_key)
+    if entry is None:
+        return None
+
+    user, exp = entry
+    if exp <= time.time():
+        _token_cache.pop(cache_key, None)
+        return None
+    return copy.copy(user)
+
+
+@db_sync_to_async
 def get_user_from_token(token_key):
-    """Get user from JWT token."""
+    """Get user and token expiry from JWT token."""
     from django.contrib.auth import get_user_model
     User = get_user_model()
     
     try:
         access_token = AccessToken(token_key)
         user_id = access_token['user_id']
-        return User.objects.get(id=user_id)
+        return User.objects.get(id=user_id), access_token['exp']
     except (InvalidToken, TokenError, User.DoesNotExist):
-        return AnonymousUser()
+        return AnonymousUser(), None
+
+
+async def authenticate_token(token_key):
+    """Resolve a user from a JWT, consulting the in-process cache first."""
+    user = get_cached_user(token_key)
+    if user is not None:
+        return user
+
+    user, exp = await get_user_from_token(token_key)
+    if exp is None:
+        _token_cache.pop(_token_cache_key(token_key), None)
+    else:
+        _token_cache[_token_cache_key(token_key)] = (user, exp)
+        user = copy.copy(user)
+    return user
 
 
 class JWTAuthMiddleware(BaseMiddleware):
@@ -26,37 +79,43 @@ class JWTAuthMiddleware(BaseMiddleware):
     Token can be passed via:
     1. Query parameter: ws://host/ws/path/?token=<jwt_token>
     2. Subprotocol: Sec-WebSocket-Protocol header
+    
+    Validated tokens are cached for up to a minute (never past their
+    expiry), so reconnecting clients skip signature checks and the user lookup.
     """
     
     async def __call__(self, scope, receive, send):
         try:
-            # Get token from query string
-            query_string = scope.get('query_string', b'').decode()
+            # Get token from query string (skip parsing when there is none)
+            query_string = scope.get('query_string', b'')
             token = None
             
-            if query_string:
-                from urllib.parse import parse_qs
-                params = parse_qs(query_string)
-                if 'token' in params:
-                    token = params['token'][0]
+            if b'token=' in query_string:
+                params = parse_qs(
+                    query_string.decode('ascii', 'ignore'),
+                    max_num_fields=8
+                )
+                token = params.get('token', [None])[0]
             
             # If no token in query, check subprotocols
             if not token:
-                subprotocols = scope.get('subprotocols', [])
-                for protocol in subprotocols:
-                    if protocol.startswith('access_token_'):
-                        token = protocol.replace('access_token_', '')
-                        break
+                subprotocols = scope.get('subprotocols')
+                if subprotocols:
+                    token = next(
+                        (p[_TOKEN_PROTOCOL_PREFIX_LEN:] for p in subprotocols
+                         if p.startswith(_TOKEN_PROTOCOL_PREFIX)),
+                        None
+                    )
             
             # Authenticate user
             if token:
-                user = await get_user_from_token(token)
+                user = await authenticate_token(token)
                 scope['user'] = user
             else:
                 scope['user'] = AnonymousUser()
         except Exception as e:
             # Fallback to anonymous user on any error to prevent crash
-            print(f"JWT Middleware Error: {e}")
+            logger.warning("JWT middleware error: %s", e)
             scope['user'] = AnonymousUser()
         
         return await super().__call__(scope, receive, send)
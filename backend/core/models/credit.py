@@ -32,18 +32,31 @@ class Bank(models.Model):
         bank, _ = cls.objects.get_or_create(pk=1)
         return bank
     
+    def _locked_total(self):
+        """Lock the bank row and return its current total (call inside atomic)."""
+        return type(self).objects.select_for_update().values_list(
+            'total_credits', flat=True
+        ).get(pk=self.pk)
+    
     def add_credits(self, amount):
         """Add credits to the bank (from transaction cuts)."""
-        self.total_credits += Decimal(str(amount))
-        self.save(update_fields=['total_credits', 'updated_at'])
+        from django.db import transaction as db_transaction
+        
+        with db_transaction.atomic():
+            self.total_credits = self._locked_total() + Decimal(str(amount))
+            self.save(update_fields=['total_credits', 'updated_at'])
     
     def deduct_credits(self, amount):
         """Deduct credits from bank (for support payouts)."""
+        from django.db import transaction as db_transaction
+        
         amount = Decimal(str(amount))
-        if self.total_credits < amount:
-            raise ValueError('Insufficient bank credits.')
-        self.total_credits -= amount
-        self.save(update_fields=['total_credits', 'updated_at'])
+        with db_transaction.atomic():
+            total = self._locked_total()
+            if total < amount:
+                raise ValueError('Insufficient bank credits.')
+            self.total_credits = total - amount
+            self.save(update_fields=['total_credits', 'updated_at'])
 
 
 class CreditTransaction(models.Model):
@@ -111,8 +124,12 @@ class CreditTransaction(models.Model):
         from django.db import transaction as db_transaction
         
         with db_transaction.atomic():
-            # Update user credits
-            new_balance = user.credits + Decimal(str(amount))
+            # Update user credits from the locked row, not the possibly stale
+            # instance, so concurrent writers cannot overwrite each other
+            current = type(user).objects.select_for_update().values_list(
+                'credits', flat=True
+            ).get(pk=user.pk)
+            new_balance = current + Decimal(str(amount))
             if new_balance < 0:
                 raise ValueError('Insufficient credits.')
             user.credits = new_balance
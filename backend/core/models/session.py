@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Min, Q, Sum
 from django.conf import settings
 from django.utils import timezone
 
@@ -61,6 +62,25 @@ class Session(models.Model):
                 total_seconds += int(elapsed)
         return total_seconds
     
+    def get_teaching_times(self):
+        """
+        Get total teaching time for every teacher in this session.
+        Returns {user_id: seconds} from a single grouped query.
+        """
+        rows = self.timers.order_by().values('teacher_id').annotate(
+            finished=Sum('duration_seconds', filter=Q(end_time__isnull=False)),
+            running_since=Min('start_time', filter=Q(end_time__isnull=True)),
+        )
+        now = timezone.now()
+        totals = {}
+        for row in rows:
+            total_seconds = row['finished'] or 0
+            if row['running_since']:
+                # Include elapsed time for running timer
+                total_seconds += int((now - row['running_since']).total_seconds())
+            totals[row['teacher_id']] = total_seconds
+        return totals
+    
     def end_session(self):
         """End the session and stop any running timers."""
         self.is_active = False
@@ -0,0 +1,98 @@
+"""
+Redis-backed cache of each user's active session IDs.
+
+Kept in sync by the Session signals in core.signals and read by ChatConsumer
+to answer participant checks with SISMEMBER instead of a Postgres query.
+A miss (or Redis being unavailable) just means falling back to the DB.
+"""
+
+import logging
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_sync_client = None
+_async_client = None
+
+
+def _key(user_id):
+    return f'user:{user_id}:active_sessions'
+
+
+def _client_options():
+    timeout = settings.ACTIVE_SESSION_CACHE_SOCKET_TIMEOUT
+    return {
+        'host': settings.REDIS_HOST,
+        'port': settings.REDIS_PORT,
+        'socket_timeout': timeout,
+        'socket_connect_timeout': timeout,
+    }
+
+
+def _get_sync_client():
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis(**_client_options())
+    return _sync_client
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis(**_client_options())
+    return _async_client
+
+
+def add_active_session(session):
+    """Add a session to both participants' active sets."""
+    if not settings.ACTIVE_SESSION_CACHE_ENABLED:
+        return
+    try:
+        pipe = _get_sync_client().pipeline()
+        for user_id in (session.user1_id, session.user2_id):
+            pipe.sadd(_key(user_id), session.pk)
+            pipe.expire(_key(user_id), settings.ACTIVE_SESSION_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not cache active session %s: %s", session.pk, e)
+
+
+def remove_active_session(session):
+    """Remove a session from both participants' active sets."""
+    if not settings.ACTIVE_SESSION_CACHE_ENABLED:
+        return
+    try:
+        pipe = _get_sync_client().pipeline()
+        for user_id in (session.user1_id, session.user2_id):
+            pipe.srem(_key(user_id), session.pk)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not uncache session %s: %s", session.pk, e)
+
+
+async def is_cached_participant(user_id, session_id):
+    """Return True if the session is in the user's cached active set."""
+    if not settings.ACTIVE_SESSION_CACHE_ENABLED:
+        return False
+    try:
+        return bool(await _get_async_client().sismember(_key(user_id), str(session_id)))
+    except redis.RedisError as e:
+        logger.warning("Active session cache lookup failed: %s", e)
+        return False
+
+
+async def cache_participant(user_id, session_id):
+    """Repopulate a user's active set after the DB confirms an active session."""
+    if not settings.ACTIVE_SESSION_CACHE_ENABLED:
+        return
+    try:
+        pipe = _get_async_client().pipeline()
+        pipe.sadd(_key(user_id), str(session_id))
+        pipe.expire(_key(user_id), settings.ACTIVE_SESSION_CACHE_TTL)
+        await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not repopulate active session cache: %s", e)
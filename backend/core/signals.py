@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Session
+from .session_cache import add_active_session, remove_active_session
+
+
+@receiver(post_save, sender=Session)
+def sync_active_session_cache(sender, instance, **kwargs):
+    """Mirror session active state into the Redis cache once committed."""
+    if instance.is_active:
+        transaction.on_commit(lambda: add_active_session(instance))
+    else:
+        transaction.on_commit(lambda: remove_active_session(instance))
+
+
+@receiver(post_delete, sender=Session)
+def drop_deleted_session_from_cache(sender, instance, **kwargs):
+    """Remove a deleted session from the Redis cache once committed."""
+    transaction.on_commit(lambda: remove_active_session(instance))
@@ -22,6 +22,32 @@ def calculate_credits(teaching_seconds: int) -> Decimal:
     return credits.quantize(Decimal('0.01'))
 
 
+def to_cents(credits: Decimal) -> int:
+    """
+    Convert a 2-decimal-place credit amount to integer cents.
+    
+    Args:
+        credits: Credit amount (as stored in the DB)
+    
+    Returns:
+        int: Amount in cents
+    """
+    return int(credits.scaleb(2))
+
+
+def from_cents(cents: int) -> Decimal:
+    """
+    Convert integer cents back to a 2-decimal-place credit amount.
+    
+    Args:
+        cents: Amount in cents
+    
+    Returns:
+        Decimal: Credit amount (e.g., 1234 -> Decimal('12.34'))
+    """
+    return Decimal(cents).scaleb(-2)
+
+
 def format_duration(seconds: int) -> str:
     """
     Format duration in human-readable format.
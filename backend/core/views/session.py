@@ -1,16 +1,17 @@
-from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from ..models import Session, SessionTimer, CreditTransaction, Bank
+from ..credits import process_credit_transfers
+from ..models import Session, SessionTimer, User
 from ..serializers import (
     SessionSerializer,
     SessionCreateSerializer,
     SessionTimerSerializer
 )
-from ..utils import calculate_credits
 
 
 class SessionViewSet(viewsets.ModelViewSet):
@@ -32,10 +33,8 @@ class SessionViewSet(viewsets.ModelViewSet):
         """Return sessions where user is a participant."""
         user = self.request.user
         return Session.objects.filter(
-            user1=user
-        ) | Session.objects.filter(
-            user2=user
-        )
+            Q(user1=user) | Q(user2=user)
+        ).select_related('user1', 'user2')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -50,7 +49,6 @@ class SessionViewSet(viewsets.ModelViewSet):
         user2_data = request.data.get('user2')
         if user2_data:
             try:
-                from django.db.models import Q
                 # Check for existing active session (Direct lookup handles ID text/int)
                 # We use user2_id to match the FK field directly
                 existing = Session.objects.filter(
@@ -76,7 +74,7 @@ class SessionViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Verify user is participant
-        if user not in [session.user1, session.user2]:
+        if user.id not in (session.user1_id, session.user2_id):
             return Response(
                 {'error': 'You are not a participant in this session.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -92,7 +90,7 @@ class SessionViewSet(viewsets.ModelViewSet):
         # Check if there's already a running timer
         active_timer = session.get_active_timer()
         if active_timer:
-            if active_timer.teacher == user:
+            if active_timer.teacher_id == user.id:
                 return Response(
                     {'error': 'Your timer is already running.'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -117,7 +115,7 @@ class SessionViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Verify user is participant
-        if user not in [session.user1, session.user2]:
+        if user.id not in (session.user1_id, session.user2_id):
             return Response(
                 {'error': 'You are not a participant in this session.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -132,7 +130,7 @@ class SessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if active_timer.teacher != user:
+        if active_timer.teacher_id != user.id:
             return Response(
                 {'error': 'You can only stop your own timer.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -157,24 +155,31 @@ class SessionViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Verify user is participant
-        if user not in [session.user1, session.user2]:
+        if user.id not in (session.user1_id, session.user2_id):
             return Response(
                 {'error': 'You are not a participant in this session.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Check if session is already ended
-        if not session.is_active:
-            return Response(
-                {'error': 'Session is already ended.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # End session (this also stops any running timers)
-        session.end_session()
-        
-        # Calculate and transfer credits
-        credit_summary = self._process_credit_transfers(session)
+        with transaction.atomic():
+            # Lock the session row and re-check it in the same transaction as
+            # the transfer, so two concurrent end calls cannot both charge
+            session = Session.objects.select_for_update(of=('self',)).select_related(
+                'user1', 'user2'
+            ).get(pk=session.pk)
+            
+            # Check if session is already ended
+            if not session.is_active:
+                return Response(
+                    {'error': 'Session is already ended.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # End session (this also stops any running timers)
+            session.end_session()
+            
+            # Calculate and transfer credits
+            credit_summary = process_credit_transfers(session)
         
         return Response({
             'message': 'Session ended.',
@@ -195,11 +200,10 @@ class SessionViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
             
-        if user == target_user:
+        if user.id == target_user.id:
             return Response({'error': 'Cannot chat with yourself.'}, status=status.HTTP_400_BAD_REQUEST)
             
         # Check for existing active session
-        from django.db.models import Q
         active_session = Session.objects.filter(
             (Q(user1=user, user2=target_user) | Q(user1=target_user, user2=user)),
             is_active=True
@@ -217,117 +221,3 @@ class SessionViewSet(viewsets.ModelViewSet):
         )
         
         return Response(SessionSerializer(session).data, status=status.HTTP_201_CREATED)
-    
-    def _process_credit_transfers(self, session):
-        """
-        Process credit transfers based on teaching time.
-        5 minutes teaching = 1 credit
-        Bank takes 10% cut from teacher earnings.
-        """
-        from django.db import transaction
-        
-        user1_teaching_seconds = session.get_teaching_time(session.user1)
-        user2_teaching_seconds = session.get_teaching_time(session.user2)
-        
-        credit_summary = {
-            'user1': {
-                'id': session.user1.id,
-                'name': session.user1.name,
-                'teaching_seconds': user1_teaching_seconds,
-                'credits_earned': 0,
-                'credits_spent': 0,
-            },
-            'user2': {
-                'id': session.user2.id,
-                'name': session.user2.name,
-                'teaching_seconds': user2_teaching_seconds,
-                'credits_earned': 0,
-                'credits_spent': 0,
-            },
-            'bank_cut': 0
-        }
-        
-        bank = Bank.get_instance()
-        
-        with transaction.atomic():
-            # User1 taught, User2 learns
-            if user1_teaching_seconds > 0:
-                # Refresh from DB to get latest credits
-                session.user1.refresh_from_db()
-                session.user2.refresh_from_db()
-                
-                credits_needed = calculate_credits(user1_teaching_seconds)
-                
-                # Check learner (user2) balance
-                learner_balance = session.user2.credits
-                actual_credits = min(credits_needed, learner_balance)
-                
-                if actual_credits > 0:
-                    bank_cut = actual_credits * Decimal('0.10')
-                    teacher_receives = actual_credits - bank_cut
-                    
-                    # Deduct from learner (user2)
-                    CreditTransaction.record_transaction(
-                        user=session.user2,
-                        amount=-actual_credits,
-                        transaction_type='LEARNING',
-                        session=session,
-                        description=f'Learning from {session.user1.name}'
-                    )
-                    credit_summary['user2']['credits_spent'] = float(actual_credits)
-                    
-                    # Add to teacher (user1) - minus bank cut
-                    CreditTransaction.record_transaction(
-                        user=session.user1,
-                        amount=teacher_receives,
-                        transaction_type='TEACHING',
-                        session=session,
-                        description=f'Teaching {session.user2.name}'
-                    )
-                    credit_summary['user1']['credits_earned'] = float(teacher_receives)
-                    
-                    # Bank takes cut
-                    bank.add_credits(bank_cut)
-                    credit_summary['bank_cut'] += float(bank_cut)
-            
-            # User2 taught, User1 learns
-            if user2_teaching_seconds > 0:
-                # Refresh from DB to get latest credits
-                session.user1.refresh_from_db()
-                session.user2.refresh_from_db()
-
-                credits_needed = calculate_credits(user2_teaching_seconds)
-                
-                # Check learner (user1) balance
-                learner_balance = session.user1.credits
-                actual_credits = min(credits_needed, learner_balance)
-                
-                if actual_credits > 0:
-                    bank_cut = actual_credits * Decimal('0.10')
-                    teacher_receives = actual_credits - bank_cut
-                    
-                    # Deduct from learner (user1)
-                    CreditTransaction.record_transaction(
-                        user=session.user1,
-                        amount=-actual_credits,
-                        transaction_type='LEARNING',
-                        session=session,
-                        description=f'Learning from {session.user2.name}'
-                    )
-                    credit_summary['user1']['credits_spent'] = float(actual_credits)
-                    
-                    # Add to teacher (user2) - minus bank cut
-                    CreditTransaction.record_transaction(
-                        user=session.user2,
-                        amount=teacher_receives,
-                        transaction_type='TEACHING',
-                        session=session,
-                        description=f'Teaching {session.user1.name}'
-                    )
-                    credit_summary['user2']['credits_earned'] = float(teacher_receives)
-                    
-                    # Bank takes cut
-                    bank.add_credits(bank_cut)
-                    credit_summary['bank_cut'] += float(bank_cut)
-        
-        return credit_summary
@@ -89,14 +89,22 @@ import os
 if 'DATABASE_URL' not in os.environ:
     raise RuntimeError("DATABASE_URL environment variable not set. This project requires PostgreSQL.")
 
+# Set USE_PGBOUNCER=True when DATABASE_URL points at a transaction-mode
+# PgBouncer: the pooler bounds connections to Postgres, so Django must not
+# hold its own persistent connections or use server-side cursors.
+USE_PGBOUNCER = os.getenv('USE_PGBOUNCER', 'False').lower() == 'true'
+
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
+        conn_max_age=0 if USE_PGBOUNCER else 600,
         ssl_require=os.environ.get('RENDER', 'False') == 'true'
     )
 }
 
+if USE_PGBOUNCER:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # For production with PostgreSQL:
 # DATABASES = {
 #     'default': {
@@ -169,25 +177,49 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Redis
+REDIS_HOST = os.getenv('REDIS_HOST', '127.0.0.1')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+
 # Django Channels
 # Use in-memory channel layer for development (no Redis required)
-# For production, set DEBUG=False and ensure Redis is running
+# For production, set DEBUG=False and ensure Redis is running,
+# or set RABBITMQ_URL to use the RabbitMQ layer (cheaper group_send fan-out)
 if DEBUG:
     CHANNEL_LAYERS = {
         'default': {
             'BACKEND': 'channels.layers.InMemoryChannelLayer',
         },
     }
+elif os.getenv('RABBITMQ_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_rabbitmq.core.RabbitmqChannelLayer',
+            'CONFIG': {
+                'host': os.getenv('RABBITMQ_URL'),
+                'local_capacity': 100,
+                'remote_capacity': 100,
+            },
+        },
+    }
 else:
     CHANNEL_LAYERS = {
         'default': {
             'BACKEND': 'channels_redis.core.RedisChannelLayer',
             'CONFIG': {
-                'hosts': [(os.getenv('REDIS_HOST', '127.0.0.1'), int(os.getenv('REDIS_PORT', 6379)))],
+                'hosts': [(REDIS_HOST, REDIS_PORT)],
             },
         },
     }
 
+# Per-user sets of active session IDs kept in Redis so chat connects can
+# skip the participant query. Opt-in, since not every deployment has Redis
+# (e.g. RabbitMQ channel layer).
+ACTIVE_SESSION_CACHE_ENABLED = os.getenv('ACTIVE_SESSION_CACHE_ENABLED', 'False').lower() == 'true'
+ACTIVE_SESSION_CACHE_TTL = 60 * 60  # seconds
+# Keep Redis stalls from blocking the shared sync thread (signals run there)
+ACTIVE_SESSION_CACHE_SOCKET_TIMEOUT = 0.25  # seconds
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS',